@@ -1,14 +1,25 @@
+from gevent import monkey
+monkey.patch_all()
+
 from flask import Flask, request, jsonify
 from flask_cors import CORS
+from werkzeug.exceptions import RequestEntityTooLarge
 import os
 import requests
-import json
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import orjson
 from dotenv import load_dotenv
 import gspread
 from datetime import date
-import assemblyai as aai
-import tempfile
 import io
+import atexit
+import copy
+import hashlib
+import threading
+import time
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
 
 
 load_dotenv()
@@ -22,166 +33,511 @@ GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 if not ASSEMBLYAI_API_KEY:
     raise ValueError("ASSEMBLYAI_API_KEY not found. Make sure it's set in your .env file.")
 
-aai.settings.api_key = ASSEMBLYAI_API_KEY
-
-
 if not GEMINI_API_KEY:
     raise ValueError("GEMINI_API_KEY not found. Make sure it's set in your .env file.")
 
 
+# Background pipeline workers and in-process job state (use Redis when running several instances)
+executor = ThreadPoolExecutor(max_workers=8)
+JOBS: dict[str, dict] = {}
+JOB_TTL_SECONDS = 60 * 60
+MAX_UPLOAD_BYTES = 10 * 1024 * 1024
+# Werkzeug also enforces this on chunked bodies, which carry no Content-Length to check up front
+app.config["MAX_CONTENT_LENGTH"] = MAX_UPLOAD_BYTES
+
+# Shared HTTP session for Gemini and AssemblyAI: pooled keep-alive connections and 429/5xx backoff
+_session = requests.Session()
+_session.mount("https://", HTTPAdapter(
+    pool_connections=32,
+    pool_maxsize=64,
+    max_retries=Retry(
+        total=3,
+        backoff_factor=0.5,
+        status_forcelist=[429, 500, 502, 503, 504],
+        allowed_methods=frozenset({"GET", "POST"}),
+        raise_on_status=False
+    )
+))
+
+class _TokenBucket:
+    """
+    Blocking token bucket: allows `rate` calls per second with bursts of up to max(1, rate).
+    """
+
+    def __init__(self, rate):
+        self.rate = rate
+        self.capacity = max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+def _rate_from_env(name, default):
+    rate = float(os.getenv(name, default))
+    if rate <= 0:
+        raise ValueError(f"{name} must be a positive number of requests per second")
+    return rate
+
+# Outbound request budgets; AssemblyAI allows 20,000 requests per 5 minutes
+_aai_bucket = _TokenBucket(_rate_from_env("ASSEMBLYAI_REQUESTS_PER_SECOND", "60"))
+_gemini_bucket = _TokenBucket(_rate_from_env("GEMINI_REQUESTS_PER_SECOND", "30"))
+
+# AssemblyAI REST endpoints; transcripts are polled starting at 250 ms, backing off to 2 s
+_ASSEMBLYAI_URL = "https://api.assemblyai.com/v2"
+_ASSEMBLYAI_HEADERS = {"authorization": ASSEMBLYAI_API_KEY}
+_POLL_INITIAL_DELAY = 0.25
+_POLL_MAX_DELAY = 2.0
+_TRANSCRIBE_TIMEOUT = 10 * 60
+_UPLOAD_CHUNK_SIZE = 64 * 1024
+# A chunked upload body is a one-shot generator and can't be replayed, so never auto-retry it
+_session.mount(f"{_ASSEMBLYAI_URL}/upload", HTTPAdapter(max_retries=0))
+
+# Gemini request pieces that are identical for every call
+_GEMINI_URL = "https://generativelanguage.googleapis.com/v1beta/models/gemini-1.5-flash:generateContent"
+_GEMINI_HEADERS = {
+    'Content-Type': 'application/json',
+    'x-goog-api-key': GEMINI_API_KEY
+}
+_GEMINI_GENERATION_CONFIG = {
+    "response_mime_type": "application/json",
+    "maxOutputTokens": 128,
+    "temperature": 0
+}
+_PROMPT_TMPL = (
+    "Extract the job application from this transcript.\n"
+    "Transcript: \"{transcript}\"\n"
+    "Return JSON {{company_name,job_role,resume_version,platform,status}}"
+)
+
+# Fallbacks for fields Gemini leaves out
+_DEFAULTS = {
+    "company_name": "N/A",
+    "job_role": "N/A",
+    "resume_version": "N/A",
+    "platform": "N/A",
+    "status": "applied"
+}
+
+# Gemini extraction results keyed by normalized transcript hash
+_LLM_CACHE_TTL = 24 * 60 * 60
+_LLM_CACHE_MAX_ENTRIES = 1024
+# Transcripts Gemini rejected with a 4xx fail fast for this long
+_LLM_ERROR_TTL = 60
+_llm_cache: dict[str, tuple[float, dict]] = {}
+_llm_cache_lock = threading.Lock()
+_inflight: dict[str, Future] = {}
+_inflight_lock = threading.Lock()
+
+# Service-account credentials, read from disk once at import
+try:
+    with open("credentials.json", "rb") as f:
+        _GCP_CREDENTIALS = orjson.loads(f.read())
+except FileNotFoundError:
+    raise ValueError("credentials.json not found. Place your service account credentials in the project root.")
+
+# Google Sheets client and handle, opened once and shared across requests
+_gc = None
+_worksheet = None
+_ws_lock = threading.Lock()
+
+
+def _get_worksheet():
+    global _gc, _worksheet
+    if _worksheet is None:
+        with _ws_lock:
+            if _worksheet is None:
+                if _gc is None:
+                    _gc = gspread.service_account_from_dict(_GCP_CREDENTIALS)
+                _worksheet = _gc.open("JobsHunt-sheet").get_worksheet(0)
+    return _worksheet
+
+
+def prefetch_worksheet():
+    try:
+        _get_worksheet()
+    except Exception as e:
+        print("Google Sheets prefetch failed, the flusher will retry")
+
+
+def _reset_worksheet():
+    global _gc, _worksheet
+    with _ws_lock:
+        _gc = None
+        _worksheet = None
 
-def transcribe_audio_in_memory(audio_data):
 
+# Rows waiting to be written to the sheet in one append_rows call
+_SHEET_FLUSH_INTERVAL = 2
+_SHEET_FLUSH_MAX_ROWS = 25
+# Oldest rows are dropped beyond this while Sheets keeps failing
+_SHEET_BUFFER_LIMIT = 1000
+_row_buffer: list[list] = []
+_buffer_lock = threading.Lock()
+_flush_now = threading.Event()
+
+
+
+def _iter_chunks(stream, chunk_size=_UPLOAD_CHUNK_SIZE):
+    while True:
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            break
+        yield chunk
+
+def upload_audio_to_assemblyai(audio_stream):
+    """
+    Streams the audio to AssemblyAI in 64 KB chunks and returns the upload
+    URL to transcribe from. At most one chunk is held in memory at a time.
+    """
+    try:
+        print("⬆️ Uploading audio to AssemblyAI...")
+        _aai_bucket.acquire()
+        response = _session.post(
+            f"{_ASSEMBLYAI_URL}/upload",
+            headers=_ASSEMBLYAI_HEADERS,
+            data=_iter_chunks(audio_stream),
+            timeout=60
+        )
+        response.raise_for_status()
+        return orjson.loads(response.content)["upload_url"]
+
+    except Exception as e:
+        print(f"Upload error: {e}")
+        raise
+
+def transcribe_uploaded_audio(upload_url):
+    """
+    Submits the uploaded audio for transcription and polls until it finishes,
+    starting with a short interval so short clips return quickly.
+    """
     try:
         print("🎙️ Transcribing audio with AssemblyAI...")
-        
-        # Create a temporary file-like object in memory
-        with tempfile.NamedTemporaryFile(suffix='.webm', delete=False) as temp_file:
-            temp_file.write(audio_data)
-            temp_file_path = temp_file.name
-        
-        try:
-            transcriber = aai.Transcriber()
-            transcript = transcriber.transcribe(temp_file_path)
-            
-            if transcript.status == aai.TranscriptStatus.error:
-                raise Exception(f"Transcription failed: {transcript.error}")
-            
-            return transcript.text
-            
-        finally:
-            os.unlink(temp_file_path)
-            
+
+        _aai_bucket.acquire()
+        response = _session.post(
+            f"{_ASSEMBLYAI_URL}/transcript",
+            headers=_ASSEMBLYAI_HEADERS,
+            json={"audio_url": upload_url},
+            timeout=20
+        )
+        response.raise_for_status()
+        transcript_id = orjson.loads(response.content)["id"]
+
+        deadline = time.monotonic() + _TRANSCRIBE_TIMEOUT
+        delay = _POLL_INITIAL_DELAY
+        while time.monotonic() < deadline:
+            time.sleep(delay)
+            delay = min(delay * 1.5, _POLL_MAX_DELAY)
+
+            _aai_bucket.acquire()
+            response = _session.get(
+                f"{_ASSEMBLYAI_URL}/transcript/{transcript_id}",
+                headers=_ASSEMBLYAI_HEADERS,
+                timeout=20
+            )
+            response.raise_for_status()
+            transcript = orjson.loads(response.content)
+
+            if transcript["status"] == "completed":
+                return transcript.get("text") or ""
+            if transcript["status"] == "error":
+                raise Exception(f"Transcription failed: {transcript.get('error')}")
+
+        raise Exception("Transcription timed out")
+
     except Exception as e:
         print(f"Transcription error: {e}")
         raise
 
+def _transcript_key(transcript_text):
+    return hashlib.sha256(transcript_text.strip().lower().encode()).hexdigest()
+
+def _cache_get(key):
+    with _llm_cache_lock:
+        entry = _llm_cache.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.time():
+            del _llm_cache[key]
+            return None
+        return copy.deepcopy(value)
+
+def _cache_put(key, value, ttl=_LLM_CACHE_TTL):
+    with _llm_cache_lock:
+        _llm_cache.pop(key, None)
+        _llm_cache[key] = (time.time() + ttl, copy.deepcopy(value))
+        while len(_llm_cache) > _LLM_CACHE_MAX_ENTRIES:
+            del _llm_cache[next(iter(_llm_cache))]
+
 def extract_job_details(transcript_text):
     """
     Uses Google Gemini API to extract structured job application details from transcript text.
     Implements proper exception handling and logic checks.
+    Results are cached per transcript so re-submissions skip the API call.
     """
-    import time
+    cache_key = _transcript_key(transcript_text)
+    cached = _cache_get(cache_key)
+    if cached is not None:
+        if "__error__" in cached:
+            print("Skipping Gemini call, transcript was recently rejected")
+            raise Exception("API request failed")
+        print("⚡ Using cached extraction for identical transcript")
+        return cached
 
-    print("🤖 Extracting job details with Gemini...")
+    # Single-flight: identical transcripts arriving together share one Gemini call
+    with _inflight_lock:
+        future = _inflight.get(cache_key)
+        is_owner = future is None
+        if is_owner:
+            future = Future()
+            _inflight[cache_key] = future
 
-    url = "https://generativelanguage.googleapis.com/v1beta/models/gemini-1.5-flash:generateContent"
-    headers = {
-        'Content-Type': 'application/json',
-        'x-goog-api-key': GEMINI_API_KEY
-    }
+    if not is_owner:
+        print("⏳ Waiting on identical in-flight extraction")
+        return copy.deepcopy(future.result())
 
-    prompt = (
-        "You are an intelligent assistant that extracts job application details from a text transcript and provides the output in a clean JSON format. "
-        "Extract the following four fields: company_name, job_role, resume_version, platform, and status.\n\n"
-        f"Here is the transcript:\n\"{transcript_text}\"\n\n"
-        "Return only valid JSON with these exact field names: company_name, resume_version, job_role platform, status"
-    )
+    try:
+        extracted_data = _request_extraction(transcript_text, cache_key)
+        future.set_result(extracted_data)
+        return extracted_data
+    except Exception as e:
+        future.set_exception(e)
+        raise
+    finally:
+        with _inflight_lock:
+            _inflight.pop(cache_key, None)
+
+def _request_extraction(transcript_text, cache_key):
+    print("🤖 Extracting job details with Gemini...")
 
     data = {
         "contents": [
             {
                 "parts": [
                     {
-                        "text": prompt
+                        "text": _PROMPT_TMPL.format(transcript=transcript_text)
                     }
                 ]
             }
         ],
-        "generationConfig": {
-            "response_mime_type": "application/json"
-        }
+        "generationConfig": _GEMINI_GENERATION_CONFIG
     }
 
-    for attempt in range(3):  # Try up to 3 times
+    try:
+        # 429 and 5xx responses are retried with backoff by the session's adapter
+        _gemini_bucket.acquire()
+        response = _session.post(_GEMINI_URL, headers=_GEMINI_HEADERS, data=orjson.dumps(data), timeout=20)
+        response.raise_for_status() # This will raise an error for 4xx or 5xx status codes
+
+
+        api_response_data = orjson.loads(response.content)
+        if (
+            "candidates" not in api_response_data or
+            not api_response_data["candidates"] or
+            "content" not in api_response_data["candidates"][0] or
+            "parts" not in api_response_data["candidates"][0]["content"] or
+            not api_response_data["candidates"][0]["content"]["parts"] or
+            "text" not in api_response_data["candidates"][0]["content"]["parts"][0]
+        ):
+            raise ValueError("Unexpected API response structure: {}".format(api_response_data))
+
+        json_string = api_response_data['candidates'][0]['content']['parts'][0]['text']
         try:
-            response = requests.post(url, headers=headers, json=data, timeout=20)
-            response.raise_for_status() # This will raise an error for 4xx or 5xx status codes
-
-
-            api_response_data = response.json()
-            if (
-                "candidates" not in api_response_data or
-                not api_response_data["candidates"] or
-                "content" not in api_response_data["candidates"][0] or
-                "parts" not in api_response_data["candidates"][0]["content"] or
-                not api_response_data["candidates"][0]["content"]["parts"] or
-                "text" not in api_response_data["candidates"][0]["content"]["parts"][0]
-            ):
-                raise ValueError("Unexpected API response structure: {}".format(api_response_data))
-
-            json_string = api_response_data['candidates'][0]['content']['parts'][0]['text']
-            try:
-                extracted_data = json.loads(json_string)
-            except json.JSONDecodeError as jde:
-                print(f"JSON decode error: {jde}")
-                raise ValueError(f"Failed to parse JSON from Gemini response: {json_string}")
-
-
-            extracted_data["company_name"] = extracted_data.get("company_name", "N/A")
-            extracted_data["job_role"] = extracted_data.get("job_role", "N/A")
-            extracted_data["resume_version"] = extracted_data.get("resume_version", "N/A")
-            extracted_data["platform"] = extracted_data.get("platform", "N/A")
-            
-            if not extracted_data.get("status") or extracted_data.get("status").strip() == "":
-                extracted_data["status"] = "applied"
-                print("📝 Setting default status to 'applied'")
-            else:
-                extracted_data["status"] = extracted_data.get("status", "applied")
-
-            return extracted_data
-
-        except requests.exceptions.HTTPError as http_err:
-            status_code = http_err.response.status_code if http_err.response else None
-            if status_code and 500 <= status_code < 600:
-                print(f"⚠️ Server error ({status_code}), attempt {attempt + 1} of 3. Retrying in {2 ** attempt} seconds...")
-                time.sleep(2 ** attempt)
-            else:
-                print("Client error occurred")
-                raise Exception("API request failed")
-        except (requests.exceptions.RequestException, ValueError) as e:
-            print("Error during API request or response parsing")
-            if attempt < 2:
-                print(f"Retrying in {2 ** attempt} seconds...")
-                time.sleep(2 ** attempt)
-            else:
-                raise Exception("API request failed")
-        except Exception as e:
-            print("An unexpected error occurred")
-            raise Exception("API request failed")
+            extracted_data = orjson.loads(json_string)
+        except orjson.JSONDecodeError as jde:
+            print(f"JSON decode error: {jde}")
+            raise ValueError(f"Failed to parse JSON from Gemini response: {json_string}")
+
+
+        extracted_data = {**_DEFAULTS, **extracted_data}
+        if not (extracted_data["status"] or "").strip():
+            extracted_data["status"] = "applied"
+            print("📝 Setting default status to 'applied'")
+
+        _cache_put(cache_key, extracted_data)
+        return extracted_data
+
+    except requests.exceptions.HTTPError as http_err:
+        status_code = http_err.response.status_code if http_err.response is not None else None
+        if status_code and 500 <= status_code < 600:
+            print(f"⚠️ Server error ({status_code}) persisted after retries")
+        else:
+            print("Client error occurred")
+            if status_code and status_code != 429:
+                # Not retryable: remember the failure so identical re-uploads don't burn quota
+                _cache_put(cache_key, {"__error__": status_code}, ttl=_LLM_ERROR_TTL)
+        raise Exception("API request failed")
+    except (requests.exceptions.RequestException, ValueError) as e:
+        print("Error during API request or response parsing")
+        raise Exception("API request failed")
+    except Exception as e:
+        print("An unexpected error occurred")
+        raise Exception("API request failed")
 
-    # If all retries fail, raise an exception
-    raise Exception("API request failed after 3 attempts.")
 
 
+class _RowsRejected(Exception):
+    """Sheets refused the appended values themselves (400 INVALID_ARGUMENT)."""
+
+def _append_to_worksheet(worksheet, rows):
+    try:
+        worksheet.append_rows(rows)
+    except gspread.exceptions.APIError as api_err:
+        if api_err.response.status_code == 400 and api_err.error.get("status") == "INVALID_ARGUMENT":
+            raise _RowsRejected() from api_err
+        raise
+
+def _append_rows(rows):
+    try:
+        _append_to_worksheet(_get_worksheet(), rows)
+    except gspread.exceptions.APIError as api_err:
+        if api_err.response.status_code != 401:
+            raise
+        # Token expired: drop the cached handle and re-authenticate once
+        _reset_worksheet()
+        _append_to_worksheet(_get_worksheet(), rows)
+
+def _write_rows(rows):
+    """
+    Appends rows to the sheet and returns (written, retry, dropped) row lists.
+    Only a batch Sheets rejects as invalid is split in half until the bad row is found and dropped;
+    auth, access, network and server failures keep every row for the next flush.
+    """
+    try:
+        _append_rows(rows)
+        return rows, [], []
+    except _RowsRejected:
+        pass
+    except Exception as e:
+        return [], rows, []
+
+    if len(rows) == 1:
+        print(f"❌ Google Sheets rejected a row, dropping it: {rows[0]}")
+        return [], [], rows
+    mid = len(rows) // 2
+    written, retry, dropped = _write_rows(rows[:mid])
+    more_written, more_retry, more_dropped = _write_rows(rows[mid:])
+    return written + more_written, retry + more_retry, dropped + more_dropped
+
+def flush_sheet_buffer():
+    """
+    Writes every buffered row to Google Sheets in a single API call.
+    Rows that could not be written for reasons other than being invalid go back to the front of the buffer.
+    """
+    with _buffer_lock:
+        rows = _row_buffer[:]
+        _row_buffer.clear()
+    if not rows:
+        return
+
+    written, retry, dropped = _write_rows(rows)
+    if written:
+        print(f"✅ Added {len(written)} row(s) to Google Sheets successfully!")
+    if dropped:
+        print(f"❌ Dropped {len(dropped)} row(s) Google Sheets rejected")
+    if not retry:
+        return
+
+    print(f"Google Sheets error occurred, will retry {len(retry)} row(s) on next flush")
+    with _buffer_lock:
+        _row_buffer[:0] = retry
+        overflow = len(_row_buffer) - _SHEET_BUFFER_LIMIT
+        if overflow > 0:
+            del _row_buffer[:overflow]
+            print(f"⚠️ Sheet buffer full, dropped {overflow} oldest row(s)")
+
+def _sheet_flusher():
+    while True:
+        _flush_now.wait(_SHEET_FLUSH_INTERVAL)
+        _flush_now.clear()
+        flush_sheet_buffer()
+
+threading.Thread(target=_sheet_flusher, name="sheet-flusher", daemon=True).start()
+atexit.register(flush_sheet_buffer)
 
 def add_row_to_sheet(data):
-    
+    """
+    Queues a row for the background flusher, which batches writes to Google Sheets.
+    """
+    print("📝 Queueing row for Google Sheets...")
+
+    row = [
+        str(date.today()),
+        data.get("company_name", "N/A"),
+        data.get("job_role", "N/A"),
+        data.get("resume_version", "N/A"),
+        data.get("platform", "N/A"),
+        data.get("status", "applied")
+    ]
+    # Sheets only accepts scalar cell values; nulls stay empty cells
+    row = ["" if v is None else v if isinstance(v, str) else str(v) for v in row]
+
+    with _buffer_lock:
+        _row_buffer.append(row)
+        if len(_row_buffer) >= _SHEET_FLUSH_MAX_ROWS:
+            _flush_now.set()
+    return True
+
+def _looks_like_audio(head):
+    """
+    Checks the first bytes of an upload against the containers we accept:
+    WebM/Matroska, WAV (RIFF/WAVE), MP3 (ID3 tag or frame sync) and M4A (ftyp box).
+    """
+    return (
+        head.startswith(b"\x1a\x45\xdf\xa3") or
+        (head.startswith(b"RIFF") and head[8:12] == b"WAVE") or
+        head.startswith(b"ID3") or
+        (len(head) >= 2 and head[0] == 0xFF and head[1] & 0xE0 == 0xE0) or
+        head[4:8] == b"ftyp"
+    )
+
+def _pipeline(upload_url, job_id):
+    """
+    Runs transcription, extraction and the sheet append for one upload,
+    recording the outcome in JOBS[job_id].
+    """
+    if _worksheet is None:
+        # Authenticate and open the sheet while AssemblyAI is still transcribing
+        executor.submit(prefetch_worksheet)
+
     try:
-        print("📝 Adding row to Google Sheets...")
-        
+        transcript_text = transcribe_uploaded_audio(upload_url)
+        print(f"✅ Transcription complete: {len(transcript_text)} characters")
 
-        gc = gspread.service_account(filename='credentials.json')
-        spreadsheet = gc.open("JobsHunt-sheet")
-        worksheet = spreadsheet.get_worksheet(0)
+        job_details = extract_job_details(transcript_text)
+        print(f"✅ Extraction complete: {job_details}")
 
+        add_row_to_sheet(job_details)
 
-        row = [
-            str(date.today()),
-            data.get("company_name", "N/A"),
-            data.get("job_role", "N/A"),
-            data.get("resume_version", "N/A"),
-            data.get("platform", "N/A"),
-            data.get("status", "applied")
-        ]
+        JOBS[job_id].update({
+            "status": "success",
+            "message": "Audio processed and job details queued for the sheet!",
+            "extracted_data": job_details
+        })
 
-        worksheet.append_row(row)
-        print("✅ Row added to Google Sheets successfully!")
-        return True
-        
     except Exception as e:
-        print("Google Sheets error occurred")
-        raise Exception("Failed to save data")
+        print(f"❌ Error in pipeline for job {job_id}")
+        JOBS[job_id].update({
+            "status": "error",
+            "error": "Processing failed. Please try again."
+        })
+
+def _prune_jobs():
+    cutoff = time.time() - JOB_TTL_SECONDS
+    for job_id in [k for k, v in JOBS.items() if v["created_at"] < cutoff]:
+        JOBS.pop(job_id, None)
 
 @app.route('/', methods=['GET'])
 def index():
@@ -190,6 +546,9 @@ def index():
 @app.route('/upload-audio', methods=['POST'])
 def upload_audio():
     try:
+        # Reject oversized uploads from the header, before the multipart body is spooled (max 10MB)
+        if request.content_length and request.content_length > MAX_UPLOAD_BYTES:
+            return jsonify({"error": "File too large. Maximum size is 10MB."}), 413
 
         if 'audio_data' not in request.files:
             return jsonify({"error": "No audio file provided"}), 400
@@ -203,45 +562,48 @@ def upload_audio():
         file_extension = os.path.splitext(file.filename)[1].lower()
         if file_extension not in allowed_extensions:
             return jsonify({"error": "Invalid file type. Please upload an audio file."}), 400
-        
-        # Validate file size (max 10MB)
-        file.seek(0, 2)  # Seek to end
-        file_size = file.tell()
-        file.seek(0)  # Reset to beginning
-        
-        if file_size > 10 * 1024 * 1024:  # 10MB limit
-            return jsonify({"error": "File too large. Maximum size is 10MB."}), 400
+
+        # Sniff the container header instead of trusting the file name
+        head = file.stream.read(16)
+        file.stream.seek(0)
+        if not _looks_like_audio(head):
+            return jsonify({"error": "Invalid file type. Please upload an audio file."}), 400
 
         print("📁 Received audio file, starting processing...")
-        audio_data = file.read()        
+        # The request stream is gone once we respond, so upload it before handing off
+        upload_url = upload_audio_to_assemblyai(file.stream)
 
-        transcript_text = transcribe_audio_in_memory(audio_data)
-        print(f"✅ Transcription complete: {len(transcript_text)} characters")
-        
-        job_details = extract_job_details(transcript_text)
-        print(f"✅ Extraction complete: {job_details}")
-        
-        add_row_to_sheet(job_details)
-        
+        _prune_jobs()
+        job_id = uuid.uuid4().hex
+        JOBS[job_id] = {"status": "processing", "created_at": time.time()}
+        executor.submit(_pipeline, upload_url, job_id)
 
-        return jsonify({
-            "status": "success",
-            "message": "Audio processed and job details added to sheet successfully!",
-            "extracted_data": job_details
-        }), 200
-        
+        return jsonify({"status": "processing", "job_id": job_id}), 202
+
+    except RequestEntityTooLarge:
+        return jsonify({"error": "File too large. Maximum size is 10MB."}), 413
     except Exception as e:
         print("❌ Error in upload_audio")
         return jsonify({
             "error": "Processing failed. Please try again."
         }), 500
 
+@app.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    job = JOBS.get(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+
+    return jsonify({k: v for k, v in job.items() if k != "created_at"}), 200
+
 
 
 
 if __name__ == '__main__':
+    # Local development only; serve with `gunicorn -c gunicorn_conf.py app:app`
     print("🚀 Starting JobHunt Backend...")
     print("📋 Available endpoints:")
     print("   - GET  / : Health check")
     print("   - POST /upload-audio : Process audio and add to sheets")
+    print("   - GET  /jobs/<job_id> : Processing status and extracted data")
     app.run(debug=False, host='0.0.0.0', port=5000) 
\ No newline at end of file
@@ -0,0 +1,33 @@
+#!/usr/bin/env bash
+# Builds lambda.zip with only lambda_app.py and its dependencies.
+# code-parts/, frontend.html, app.py and raw_data.txt are never copied in, and only the
+# handler's runtime dependencies (requirements-lambda.txt) are installed.
+set -euo pipefail
+
+cd "$(dirname "$0")"
+
+BUILD_DIR=package
+PYTHON_VERSION="${PYTHON_VERSION:-3.11}"
+
+rm -rf "$BUILD_DIR" lambda.zip
+mkdir -p "$BUILD_DIR"
+
+pip install -r requirements-lambda.txt \
+    --target "$BUILD_DIR" \
+    --platform manylinux2014_x86_64 \
+    --python-version "$PYTHON_VERSION" \
+    --only-binary=:all:
+
+cp lambda_app.py "$BUILD_DIR"/
+
+# Bytecode caches and bundled test suites only add to the zip
+find "$BUILD_DIR" -type d \( -name "__pycache__" -o -name "tests" \) -prune -exec rm -rf {} +
+
+# Ship optimized bytecode in place of sources so cold starts skip parsing.
+# -b writes foo.pyc next to foo.py (loadable once the source is gone); -o 2 strips asserts and docstrings.
+# The .pyc format is tied to the interpreter version, so it must match the Lambda runtime.
+"python${PYTHON_VERSION}" -m compileall -q -b -o 2 "$BUILD_DIR"
+find "$BUILD_DIR" -name "*.py" -delete
+
+(cd "$BUILD_DIR" && zip -qr ../lambda.zip .)
+echo "Built lambda.zip"
@@ -0,0 +1,21 @@
+import os
+
+
+bind = os.getenv("BIND", "0.0.0.0:5000")
+
+# Greenlet workers: every upload spends nearly all its time waiting on
+# AssemblyAI, Gemini and Sheets, so one process can hold many in flight.
+worker_class = "gevent"
+worker_connections = 1000
+
+# Job state lives in the worker's memory (app.JOBS), so GET /jobs/<id> must
+# reach the worker that accepted the upload. Raise this only with a shared store.
+workers = int(os.getenv("GUNICORN_WORKERS", "1"))
+
+timeout = 120
+
+
+def post_worker_init(worker):
+    # Authenticate with Google and open the sheet before the first upload arrives
+    from app import prefetch_worksheet
+    prefetch_worksheet()
@@ -1,14 +1,19 @@
 import os
-import json
-import tempfile
+import hmac
+import hashlib
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import date
 
 import boto3
-import gspread
+import orjson
 import requests
-import assemblyai as aai
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from flask import Flask, request, jsonify
 from flask_cors import CORS
+from werkzeug.exceptions import RequestEntityTooLarge
 from mangum import Mangum
 from asgiref.wsgi import WsgiToAsgi
 
@@ -16,32 +21,127 @@ from asgiref.wsgi import WsgiToAsgi
 
 
 # This helper function fetches secrets from AWS SSM Parameter Store
-def get_secret_from_ssm(parameter_name):
-    """Retrieves a secret from AWS SSM Parameter Store."""
-    print(f"🤫 Fetching secret: {parameter_name}")
+def get_secrets_from_ssm(parameter_names):
+    """Retrieves several secrets from AWS SSM Parameter Store in a single call."""
+    print(f"🤫 Fetching secrets: {', '.join(parameter_names)}")
     try:
         ssm_client = boto3.client('ssm')
-        response = ssm_client.get_parameter(Name=parameter_name, WithDecryption=True)
-        return response['Parameter']['Value']
+        response = ssm_client.get_parameters(Names=parameter_names, WithDecryption=True)
+        if response['InvalidParameters']:
+            raise KeyError(response['InvalidParameters'])
+        # Results carry the plain Name, so map them back to the requested names, ARNs or name:selector forms
+        values = {}
+        for p in response['Parameters']:
+            selector = p.get('Selector') or ''
+            if selector and not selector.startswith(':'):
+                selector = f":{selector}"
+            values[p['Name'] + selector] = values[p['ARN'] + selector] = p['Value']
+        return {name: values[name] for name in parameter_names}
     except Exception as e:
-        print(f"❌ Error retrieving secret {parameter_name} from SSM")
+        print(f"❌ Error retrieving secrets {parameter_names} from SSM")
         raise Exception("Failed to retrieve configuration")
 
 
-ASSEMBLYAI_API_KEY = get_secret_from_ssm(os.environ['ASSEMBLYAI_API_KEY_SSM_NAME'])
-GEMINI_API_KEY = get_secret_from_ssm(os.environ['GEMINI_API_KEY_SSM_NAME'])
-GCP_CREDENTIALS_JSON_STRING = get_secret_from_ssm(os.environ['GCP_CREDENTIALS_SSM_NAME'])
+ASSEMBLYAI_SSM_NAME = os.environ['ASSEMBLYAI_API_KEY_SSM_NAME']
+GEMINI_SSM_NAME = os.environ['GEMINI_API_KEY_SSM_NAME']
+GCP_CREDENTIALS_SSM_NAME = os.environ['GCP_CREDENTIALS_SSM_NAME']
+secrets = get_secrets_from_ssm([ASSEMBLYAI_SSM_NAME, GEMINI_SSM_NAME, GCP_CREDENTIALS_SSM_NAME])
+ASSEMBLYAI_API_KEY = secrets[ASSEMBLYAI_SSM_NAME]
+GEMINI_API_KEY = secrets[GEMINI_SSM_NAME]
+GCP_CREDENTIALS_JSON_STRING = secrets[GCP_CREDENTIALS_SSM_NAME]
 
-# Configure AssemblyAI client
-aai.settings.api_key = ASSEMBLYAI_API_KEY
+ASSEMBLYAI_URL = "https://api.assemblyai.com/v2"
+UPLOAD_CHUNK_SIZE = 64 * 1024
+MAX_UPLOAD_BYTES = 10 * 1024 * 1024
+GEMINI_URL = "https://generativelanguage.googleapis.com/v1beta/models/gemini-1.5-flash:generateContent"
+# Structured output: Gemini returns exactly these fields, so the prompt only needs the transcript
+GENERATION_CONFIG = {
+    "response_mime_type": "application/json",
+    "response_schema": {
+        "type": "object",
+        "properties": {
+            "company_name": {"type": "string"},
+            "job_role": {"type": "string"},
+            "resume_version": {"type": "string"},
+            "platform": {"type": "string"},
+            "status": {"type": "string"}
+        }
+    }
+}
+# The request envelope never changes, so serialize it once around a slot for the transcript
+GEMINI_BODY_PREFIX, GEMINI_BODY_SUFFIX = orjson.dumps({
+    "contents": [{"parts": [{"text": "Extract job fields from: __TRANSCRIPT__"}]}],
+    "generationConfig": GENERATION_CONFIG
+}).split(b"__TRANSCRIPT__")
 
-# MODIFICATION: Initialize Google Sheets client once during cold start
-gcp_creds_dict = json.loads(GCP_CREDENTIALS_JSON_STRING)
-gc = gspread.service_account_from_dict(gcp_creds_dict)
-spreadsheet = gc.open("JobsHunt-sheet")
+# Sheet columns after the date, and the values used when Gemini leaves a field out
+COLUMN_ORDER = ("company_name", "job_role", "resume_version", "platform", "status")
+DEFAULTS = {"company_name": "N/A", "job_role": "N/A", "resume_version": "N/A", "platform": "N/A", "status": "applied"}
+
+# AssemblyAI calls /transcript-done when a transcript finishes. The token is derived from the
+# API key so every container computes the same value without extra configuration.
+WEBHOOK_URL = os.environ.get('TRANSCRIPT_WEBHOOK_URL')
+WEBHOOK_AUTH_HEADER = "X-JobHunt-Webhook-Token"
+WEBHOOK_TOKEN = hmac.new(ASSEMBLYAI_API_KEY.encode(), b"transcript-done", hashlib.sha256).hexdigest()
+
+# Lambda (async self-invocation) and SQS (row queue) clients, only built by the paths that use them
+aws_clients = {}
+
+def get_aws_client(service):
+    """Creates a boto3 client on first use so cold starts only load the service models they need."""
+    if service not in aws_clients:
+        aws_clients[service] = boto3.client(service)
+    return aws_clients[service]
+
+# Rows wait in SQS until a scheduled invocation writes them with one append_rows call. A frozen or
+# recycled container can't hold a buffer, so without a queue each row is written straight away.
+SHEET_ROWS_QUEUE_URL = os.environ.get('SHEET_ROWS_QUEUE_URL')
+SHEET_FLUSH_MAX_ROWS = 500
+
+# Retries transient 5xx responses and read errors for the given methods; connect errors are
+# always retried since the request never reached the server
+def make_retry(allowed_methods):
+    return Retry(
+        total=2,
+        backoff_factor=0.2,
+        status_forcelist=[500, 502, 503, 504],
+        # 429s go straight back to the caller; otherwise urllib3 sleeps out Retry-After on billed time
+        respect_retry_after_header=False,
+        allowed_methods=frozenset(allowed_methods),
+        raise_on_status=False
+    )
+
+# Keep-alive sessions reused across warm invocations
+def make_session(headers):
+    session = requests.Session()
+    session.headers.update(headers)
+    session.mount("https://", HTTPAdapter(pool_connections=2, pool_maxsize=4, max_retries=make_retry({"GET", "POST"})))
+    return session
+
+aai_session = make_session({'authorization': ASSEMBLYAI_API_KEY})
+# A resent transcript submit whose first response was lost creates a second transcript (and a second
+# webhook), so POSTs under /transcript only retry connect errors; polling GETs keep full retries
+aai_session.mount(f"{ASSEMBLYAI_URL}/transcript", HTTPAdapter(pool_connections=2, pool_maxsize=4, max_retries=make_retry({"GET"})))
+# The chunked upload body is a one-shot generator and can't be replayed on retry
+aai_session.mount(f"{ASSEMBLYAI_URL}/upload", HTTPAdapter(max_retries=0))
+gemini_session = make_session({'Content-Type': 'application/json', 'x-goog-api-key': GEMINI_API_KEY})
+
+# Google Sheets handle, opened on first use so upload-only containers never load gspread
+worksheet = None
+sheets_credentials = None
+worksheet_lock = threading.Lock()
+
+# Recent extractions keyed by normalized transcript, kept while the container stays warm
+EXTRACTION_CACHE_SIZE = 256
+extraction_cache = OrderedDict()
+
+# Runs sheet/Gemini warm-up while the transcript is fetched
+executor = ThreadPoolExecutor(max_workers=2)
 
 
 app = Flask(__name__)
+# Werkzeug also enforces this on bodies that arrive without a Content-Length
+app.config["MAX_CONTENT_LENGTH"] = MAX_UPLOAD_BYTES
 CORS(app)
 asgi_app = WsgiToAsgi(app)
 
@@ -49,83 +149,167 @@ asgi_app = WsgiToAsgi(app)
 
 
 
-def transcribe_audio_in_memory(audio_data):
-    """Transcribes audio data using a temporary file, compatible with Lambda's /tmp directory."""
+def warm_gemini_connection():
+    """Opens the TLS connection to Gemini ahead of time so the extraction call reuses it."""
+    try:
+        gemini_session.head("https://generativelanguage.googleapis.com/", timeout=5)
+    except Exception as e:
+        print("Gemini warm-up failed")
+
+class UpstreamRateLimited(Exception):
+    """Raised when AssemblyAI answers 429, carrying its Retry-After hint for our own client."""
+    def __init__(self, retry_after):
+        super().__init__("Upstream rate limit reached")
+        self.retry_after = retry_after
+
+def check_response(response):
+    """Like raise_for_status, but turns a 429 into UpstreamRateLimited instead of a generic failure."""
+    if response.status_code == 429:
+        raise UpstreamRateLimited(response.headers.get("Retry-After", "30"))
+    response.raise_for_status()
+
+def iter_chunks(stream, chunk_size=UPLOAD_CHUNK_SIZE):
+    """Yields the stream in fixed-size chunks so requests sends it with chunked encoding."""
+    while True:
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            break
+        yield chunk
+
+def start_transcription(audio_stream, webhook_url):
+    """Streams audio to AssemblyAI and queues a transcript that calls webhook_url when done."""
+    try:
+        print("🎙️ Sending audio to AssemblyAI...")
+        response = aai_session.post(f"{ASSEMBLYAI_URL}/upload", data=iter_chunks(audio_stream), timeout=60)
+        check_response(response)
+        upload_url = orjson.loads(response.content)["upload_url"]
+
+        response = aai_session.post(f"{ASSEMBLYAI_URL}/transcript", json={
+            "audio_url": upload_url,
+            "webhook_url": webhook_url,
+            "webhook_auth_header_name": WEBHOOK_AUTH_HEADER,
+            "webhook_auth_header_value": WEBHOOK_TOKEN
+        }, timeout=20)
+        check_response(response)
+        return orjson.loads(response.content)["id"]
+    except UpstreamRateLimited:
+        raise
+    except Exception as e:
+        print("Transcription submit error occurred")
+        raise Exception("Audio transcription failed")
+
+def fetch_transcript_text(transcript_id):
+    """Reads the text of a finished transcript."""
     try:
-        print("🎙️ Transcribing audio with AssemblyAI...")
-        # Lambda provides a writable /tmp directory
-        with tempfile.NamedTemporaryFile(suffix='.webm', delete=False, dir='/tmp/') as temp_file:
-            temp_file.write(audio_data)
-            temp_file_path = temp_file.name
-
-        try:
-            transcriber = aai.Transcriber()
-            transcript = transcriber.transcribe(temp_file_path)
-            if transcript.status == aai.TranscriptStatus.error:
-                raise Exception("Transcription failed")
-            return transcript.text
-        finally:
-            os.unlink(temp_file_path)
+        response = aai_session.get(f"{ASSEMBLYAI_URL}/transcript/{transcript_id}", timeout=20)
+        response.raise_for_status()
+        return orjson.loads(response.content).get("text") or ""
     except Exception as e:
-        print("Transcription error occurred")
+        print("Transcript fetch error occurred")
         raise Exception("Audio transcription failed")
 
 def extract_job_details(transcript_text):
-    
-    print("🤖 Extracting job details with Gemini...")
-    url = "https://generativelanguage.googleapis.com/v1beta/models/gemini-1.5-flash:generateContent"
-    headers = {'Content-Type': 'application/json', 'x-goog-api-key': GEMINI_API_KEY}
-    prompt = (
-        "You are an intelligent assistant that extracts job application details from a text transcript and provides the output in a clean JSON format. "
-        "Extract the following fields: company_name, job_role, resume_version, platform, and status.\n\n"
-        f"Here is the transcript:\n\"{transcript_text}\"\n\n"
-        "Return only valid JSON with these exact field names: company_name, job_role,resume_version, platform, status"
+    """Extracts job fields with Gemini, reusing the result for a repeated transcript."""
+    cache_key = " ".join(transcript_text.lower().split())
+    if cache_key in extraction_cache:
+        extraction_cache.move_to_end(cache_key)
+        print("⚡ Using cached extraction for identical transcript")
+        return dict(extraction_cache[cache_key])
 
-    )
-    data = {"contents": [{"parts": [{"text": prompt}]}], "generationConfig": {"response_mime_type": "application/json"}}
+    print("🤖 Extracting job details with Gemini...")
+    # Splice the JSON-escaped transcript into the pre-serialized request envelope
+    body = GEMINI_BODY_PREFIX + orjson.dumps(transcript_text)[1:-1] + GEMINI_BODY_SUFFIX
 
     try:
-        response = requests.post(url, headers=headers, json=data, timeout=20)
+        response = gemini_session.post(GEMINI_URL, data=body, timeout=(3.05, 20))
         response.raise_for_status()
-        api_response_data = response.json()
+        api_response_data = orjson.loads(response.content)
         json_string = api_response_data['candidates'][0]['content']['parts'][0]['text']
-        extracted_data = json.loads(json_string)
+        extracted_data = orjson.loads(json_string)
         
 
-        extracted_data["company_name"] = extracted_data.get("company_name", "N/A")
-        extracted_data["job_role"] = extracted_data.get("job_role", "N/A")
-        extracted_data["resume_version"] = extracted_data.get("resume_version", "N/A")
-        extracted_data["platform"] = extracted_data.get("platform", "N/A")
-        if not extracted_data.get("status") or extracted_data.get("status").strip() == "":
-            extracted_data["status"] = "applied"
-            print("📝 Setting default status to 'applied'")
-        else:
-            extracted_data["status"] = extracted_data.get("status", "applied")
-        
+        # Keep known fields, falling back to defaults for missing or blank values
+        extracted_data = DEFAULTS | {
+            k: (v.strip() if isinstance(v, str) and v.strip() else DEFAULTS[k])
+            for k, v in extracted_data.items() if k in DEFAULTS
+        }
+
+        extraction_cache[cache_key] = dict(extracted_data)
+        if len(extraction_cache) > EXTRACTION_CACHE_SIZE:
+            extraction_cache.popitem(last=False)
         return extracted_data
     except Exception as e:
         print("Extraction error occurred")
         raise Exception("Failed to extract job details")
 
-def add_row_to_sheet(data):
-    """MODIFICATION: Appends a row using the pre-authorized Google Sheets client."""
+def get_worksheet():
+    """Imports gspread, authorizes and opens the worksheet on first use, then reuses it."""
+    global worksheet, sheets_credentials
+    with worksheet_lock:
+        if worksheet is None:
+            import gspread
+            from google.oauth2.service_account import Credentials
+            sheets_credentials = Credentials.from_service_account_info(
+                orjson.loads(GCP_CREDENTIALS_JSON_STRING), scopes=gspread.auth.DEFAULT_SCOPES
+            )
+            # Once the token is close to expiry, refresh it in the background instead of blocking a request
+            sheets_credentials.with_non_blocking_refresh()
+            worksheet = gspread.authorize(sheets_credentials).open("JobsHunt-sheet").get_worksheet(0)
+        return worksheet
+
+def prepare_sheets():
+    """Opens the worksheet and renews the OAuth token if it went stale while the container sat idle."""
+    from google.auth.credentials import TokenState
+    from google.auth.transport.requests import Request
+
+    get_worksheet()
+    if sheets_credentials.token_state != TokenState.FRESH:
+        sheets_credentials.refresh(Request())
+
+def write_rows(rows):
+    """Appends rows using the pre-authorized Google Sheets client, raising if the write fails."""
     try:
+        get_worksheet().append_rows(rows, value_input_option="RAW", insert_data_option="INSERT_ROWS")
+    except Exception:
+        print("❌ Google Sheets error occurred")
+        raise
+    print(f"✅ {len(rows)} row(s) added to Google Sheets successfully!")
+
+def add_row_to_sheet(data):
+    """
+    Queues a row for the next scheduled flush, or writes it directly when no queue is configured.
+    Failures are raised rather than kept in memory, so Lambda's async retry re-runs the job
+    instead of the row being lost with a frozen or recycled container.
+    """
+    row = [str(date.today())] + [data.get(k, DEFAULTS[k]) for k in COLUMN_ORDER]
+    if not SHEET_ROWS_QUEUE_URL:
         print("📝 Adding row to Google Sheets...")
-        worksheet = spreadsheet.get_worksheet(0)
-        row = [
-            str(date.today()),
-            data.get("company_name", "N/A"),
-            data.get("job_role", "N/A"),
-            data.get("resume_version", "N/A"),
-            data.get("platform", "N/A"),
-            data.get("status", "applied")
-        ]
-        worksheet.append_row(row)
-        print("✅ Row added to Google Sheets successfully!")
-        return True
-    except Exception as e:
-        print("Google Sheets error occurred")
-        raise Exception("Failed to save data")
+        write_rows([row])
+        return
+    get_aws_client('sqs').send_message(QueueUrl=SHEET_ROWS_QUEUE_URL, MessageBody=orjson.dumps(row).decode())
+    print("📝 Row queued for the next Google Sheets flush")
+
+def flush_sheet_rows():
+    """Drains queued rows from SQS and writes them to the sheet in a single append_rows call."""
+    if not SHEET_ROWS_QUEUE_URL:
+        return 0
+    sqs = get_aws_client('sqs')
+    messages = []
+    while len(messages) < SHEET_FLUSH_MAX_ROWS:
+        batch = sqs.receive_message(QueueUrl=SHEET_ROWS_QUEUE_URL, MaxNumberOfMessages=10).get('Messages', [])
+        if not batch:
+            break
+        messages += batch
+    if not messages:
+        return 0
+
+    write_rows([orjson.loads(m['Body']) for m in messages])
+    # Messages are only deleted after the write; if it fails they reappear for the next flush
+    for i in range(0, len(messages), 10):
+        sqs.delete_message_batch(QueueUrl=SHEET_ROWS_QUEUE_URL, Entries=[
+            {'Id': str(j), 'ReceiptHandle': m['ReceiptHandle']} for j, m in enumerate(messages[i:i + 10])
+        ])
+    return len(messages)
 
 
 
@@ -136,6 +320,10 @@ def add_row_to_sheet(data):
 @app.route('/upload-audio', methods=['POST'])
 def upload_audio():
     try:
+        # Reject oversized uploads from the header, before the multipart body is parsed (max 10MB)
+        if request.content_length and request.content_length > MAX_UPLOAD_BYTES:
+            return jsonify({"error": "File too large. Maximum size is 10MB."}), 413
+
         # Input validation
         if 'audio_data' not in request.files: 
             return jsonify({"error": "No audio file provided"}), 400
@@ -149,34 +337,81 @@ def upload_audio():
         file_extension = os.path.splitext(file.filename)[1].lower()
         if file_extension not in allowed_extensions:
             return jsonify({"error": "Invalid file type. Please upload an audio file."}), 400
-        
-        # Validate file size (max 10MB)
-        file.seek(0, 2)  # Seek to end
-        file_size = file.tell()
-        file.seek(0)  # Reset to beginning
-        
-        if file_size > 10 * 1024 * 1024:  # 10MB limit
-            return jsonify({"error": "File too large. Maximum size is 10MB."}), 400
 
         print("📁 Received audio file, starting processing...")
-        audio_data = file.read()
-        
-        transcript_text = transcribe_audio_in_memory(audio_data)
-        print(f"✅ Transcription complete: {len(transcript_text)} characters")
-        
-        job_details = extract_job_details(transcript_text)
-        print(f"✅ Extraction complete: {job_details}")
-        
-        add_row_to_sheet(job_details)
-        
+        webhook_url = WEBHOOK_URL or f"{request.url_root}transcript-done"
+        transcript_id = start_transcription(file.stream, webhook_url)
+        print(f"✅ Transcription queued: {transcript_id}")
+
         return jsonify({
-            "status": "success",
-            "message": "Audio processed and job details added to sheet successfully!",
-            "extracted_data": job_details
-        }), 200
+            "status": "processing",
+            "message": "Audio received! Job details will be added to the sheet once transcription finishes.",
+            "transcript_id": transcript_id
+        }), 202
+    except RequestEntityTooLarge:
+        return jsonify({"error": "File too large. Maximum size is 10MB."}), 413
+    except UpstreamRateLimited as e:
+        # Tell the client when to come back instead of failing opaquely and inviting instant retries
+        print("⚠️ AssemblyAI rate limit reached")
+        return jsonify({"error": "Service is busy. Please try again shortly."}), 503, {"Retry-After": e.retry_after}
     except Exception as e:
         print("❌ Error in upload_audio")
         return jsonify({"error": "Processing failed. Please try again."}), 500
 
+def process_transcript(transcript_id):
+    """Extracts job details from a finished transcript and saves them to the sheet."""
+    # Overlap the sheet setup and Gemini TLS handshake with the transcript fetch
+    if not SHEET_ROWS_QUEUE_URL:
+        executor.submit(prepare_sheets)
+    executor.submit(warm_gemini_connection)
+
+    transcript_text = fetch_transcript_text(transcript_id)
+    print(f"✅ Transcription complete: {len(transcript_text)} characters")
+
+    job_details = extract_job_details(transcript_text)
+    print(f"✅ Extraction complete: {job_details}")
+
+    add_row_to_sheet(job_details)
+    return job_details
+
+@app.route('/transcript-done', methods=['POST'])
+def transcript_done():
+    """AssemblyAI webhook: hands the finished transcript to an async invocation and acks immediately."""
+    if not hmac.compare_digest(request.headers.get(WEBHOOK_AUTH_HEADER, ""), WEBHOOK_TOKEN):
+        return jsonify({"error": "Unauthorized"}), 401
+
+    try:
+        payload = request.get_json(force=True)
+        transcript_id = payload["transcript_id"]
+        if payload.get("status") != "completed":
+            print(f"⚠️ Transcript {transcript_id} finished with status {payload.get('status')}, skipping")
+            return jsonify({"status": "skipped"}), 200
+
+        function_name = os.environ.get('AWS_LAMBDA_FUNCTION_NAME')
+        if not function_name:
+            # Not running on Lambda (local testing): process inline
+            job_details = process_transcript(transcript_id)
+            return jsonify({"status": "success", "extracted_data": job_details}), 200
+
+        # Lambda freezes threads once we respond, so queue the work as an async self-invocation
+        get_aws_client('lambda').invoke(
+            FunctionName=function_name,
+            InvocationType='Event',
+            Payload=orjson.dumps({"transcript_done": {"transcript_id": transcript_id}})
+        )
+        return jsonify({"status": "accepted"}), 202
+    except Exception as e:
+        print("❌ Error in transcript_done")
+        return jsonify({"error": "Processing failed."}), 500
+
+
+asgi_handler = Mangum(asgi_app)
 
-handler = Mangum(asgi_app)
+def handler(event, context):
+    """Lambda entry point: runs queued transcript jobs and sheet flushes directly, everything else goes through Flask."""
+    if "transcript_done" in event:
+        job_details = process_transcript(event["transcript_done"]["transcript_id"])
+        return {"status": "success", "extracted_data": job_details}
+    if "flush_sheet_rows" in event:
+        return {"status": "success", "rows_written": flush_sheet_rows()}
+    return asgi_handler(event, context)